@@ -1,4 +1,5 @@
 import csv
+import numpy as np
 from latLon import LatLon
 from poi import Poi
 from placesGeometry import PlacesGeometry
@@ -38,6 +39,51 @@ class CSVAnalysis:
         
         return pois
     
+    def read_chunks(self, chunk_size: int = 100000, fclasses: set = None, codes: set = None, bbox: tuple = None):
+        """
+        Stream points from the CSV file in chunks of at most chunk_size rows, so memory
+        is bounded by the chunk size rather than the file size. Filters are applied
+        while reading, before a row is kept.
+
+        :param chunk_size: The maximum number of rows per chunk.
+        :param fclasses: Optional set of fclass values to keep.
+        :param codes: Optional set of codes to keep.
+        :param bbox: Optional (min_lat, min_lon, max_lat, max_lon) bounding box to keep.
+        :return: A generator of dictionaries with 'names', 'fclasses' and 'coords' (latitude, longitude) arrays.
+        """
+        if codes is not None:
+            codes = {str(code) for code in codes}
+
+        def make_chunk(names, types, coords):
+            return {
+                "names": np.array(names, dtype=object),
+                "fclasses": np.array(types, dtype=object),
+                "coords": np.array(coords, dtype=float).reshape(-1, 2)
+            }
+
+        with open(self.path, encoding='utf-8', errors='ignore') as csv_file:
+            csv_reader = csv.reader(csv_file)
+            print("Streaming CSV file for points...")
+            next(csv_reader)  # Skip the header row
+            names, types, coords = [], [], []
+            for line in csv_reader:
+                if fclasses is not None and line[2] not in fclasses:
+                    continue
+                if codes is not None and line[1] not in codes:
+                    continue
+                lat = float(line[4])
+                lon = float(line[5])
+                if bbox is not None and not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]):
+                    continue
+                names.append(line[3])
+                types.append(line[2])
+                coords.append((lat, lon))
+                if len(coords) == chunk_size:
+                    yield make_chunk(names, types, coords)
+                    names, types, coords = [], [], []
+            if coords:
+                yield make_chunk(names, types, coords)
+
     def create_lat_lons(self):
         """Extract latitude and longitude from Poi objects and return a list of dictionaries."""
         pois = self.read_points()
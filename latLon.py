@@ -1,7 +1,11 @@
 import math
 import random
+import numpy as np
 
 class LatLon:
+    # Seed for the generator used by calculate_weights
+    WEIGHT_SEED = 0
+
     def __init__(self, lat: float, lon: float):
         """
         Initialize a LatLon object with latitude, longitude, and an optional weight.
@@ -41,6 +45,26 @@ class LatLon:
         else:
             return min(int(round((math.log(num, 1000) * math.log(num ** 4, 10)) / 2)), 14)
 
+    @staticmethod
+    def calculate_weights(nums: np.ndarray, rng: np.random.Generator = None):
+        """
+        Vectorized form of calculate_weight over an array of numbers. Small numbers
+        draw from an explicit generator, so results are reproducible.
+        
+        :param nums: Array of numbers to base the weight calculation on
+        :param rng: Random generator, seeded with WEIGHT_SEED if not given
+        :return: Array of calculated weights as integers
+        """
+        if rng is None:
+            rng = np.random.default_rng(LatLon.WEIGHT_SEED)
+        nums = np.asarray(nums, dtype=float)
+        small = nums <= 87
+        large = np.where(small, 1000.0, nums)  # Placeholder keeps the logarithms finite
+        weights = np.minimum(np.round((np.log(large) / np.log(1000) * (np.log(large ** 4) / np.log(10))) / 2), 14)
+        weights = weights.astype(int)
+        weights[small] = rng.integers(1, 3, size=int(small.sum()))
+        return weights
+
     def get_lat(self):
         """Return the latitude of the point."""
         return self.lat
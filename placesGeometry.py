@@ -1,4 +1,6 @@
 import re
+import math
+import numpy as np
 from latLon import LatLon
 
 class PlacesGeometry:
@@ -7,6 +9,15 @@ class PlacesGeometry:
     INCOME_THRESHOLD = 60000
     MIN_INCOME_THRESHOLD = 50000
 
+    # Level-of-detail constants (degrees) for the rasterized county masks
+    LOD_CELL_SIZE = 0.005
+    LOD_TOLERANCE = 0.001
+
+    # Mask cell values
+    MASK_OUTSIDE = 0
+    MASK_INSIDE = 1
+    MASK_BORDER = 2
+
     def __init__(self, name: str, coords: list):
         """
         Initialize a PlacesGeometry object.
@@ -20,6 +31,7 @@ class PlacesGeometry:
         self.inc = None  # Median income of the place, set later
         self.charger_num = 0  # Number of chargers in the place
         self.charger_locs = []  # List of charger locations
+        self.lod = None  # Level-of-detail geometry, built on first lookup
 
     @staticmethod
     def parse_multipolygon(multipolygon_str: str):
@@ -73,6 +85,173 @@ class PlacesGeometry:
 
         return inside
 
+    @staticmethod
+    def simplify_polygon(polygon: list, tolerance: float):
+        """
+        Simplify a polygon with the Douglas-Peucker algorithm. Every dropped vertex
+        lies within the tolerance of the simplified boundary.
+
+        :param polygon: A list of tuples representing the vertices of the polygon.
+        :param tolerance: The maximum distance (degrees) a vertex may be moved.
+        :return: A list of tuples representing the simplified polygon.
+        """
+        if len(polygon) < 3:
+            return list(polygon)
+
+        pts = np.asarray(polygon, dtype=float)
+        keep = np.zeros(len(pts), dtype=bool)
+        keep[0] = keep[-1] = True
+        stack = [(0, len(pts) - 1)]
+        while stack:
+            start, end = stack.pop()
+            if end - start < 2:
+                continue
+            segment = pts[start + 1:end]
+            dists = PlacesGeometry._segment_distances(segment, pts[start], pts[end])
+            i = int(np.argmax(dists))
+            if dists[i] > tolerance:
+                split = start + 1 + i
+                keep[split] = True
+                stack.append((start, split))
+                stack.append((split, end))
+
+        return [tuple(pt) for pt in pts[keep]]
+
+    @staticmethod
+    def _segment_distances(pts: np.ndarray, a: np.ndarray, b: np.ndarray):
+        """
+        Distance from each (x, y) row of pts to the segment from a to b.
+        """
+        ab = b - a
+        length_sq = ab.dot(ab)
+        if length_sq == 0:
+            return np.hypot(pts[:, 0] - a[0], pts[:, 1] - a[1])
+        t = np.clip(((pts - a) @ ab) / length_sq, 0.0, 1.0)
+        proj = a + t[:, None] * ab
+        return np.hypot(pts[:, 0] - proj[:, 0], pts[:, 1] - proj[:, 1])
+
+    @staticmethod
+    def _points_in_polygon(lats: np.ndarray, lons: np.ndarray, polygon: list):
+        """
+        Vectorized form of is_point_in_polygon over arrays of latitudes and longitudes.
+        """
+        inside = np.zeros(len(lats), dtype=bool)
+        if not polygon:
+            return inside
+
+        y = lats
+        x = lons
+        n = len(polygon)
+        p1x, p1y = polygon[0]
+        for i in range(n + 1):
+            p2x, p2y = polygon[i % n]
+            crosses = (y > min(p1y, p2y)) & (y <= max(p1y, p2y)) & (x <= max(p1x, p2x))
+            if p1y != p2y and p1x != p2x:
+                xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                crosses &= x <= xinters
+            inside ^= crosses
+            p1x, p1y = p2x, p2y
+
+        return inside
+
+    def build_lod(self, cell_size: float = None, tolerance: float = None):
+        """
+        Precompute the level-of-detail geometry of the place: a simplified polygon
+        and a mask over a grid covering its bounding box. Each cell is marked as
+        inside, outside, or border. A cell is only marked inside or outside when it
+        lies further than the simplification tolerance from the simplified boundary,
+        so the exact polygon cannot cross it.
+
+        :param cell_size: The size of a grid cell in degrees.
+        :param tolerance: The simplification tolerance in degrees.
+        """
+        cell_size = PlacesGeometry.LOD_CELL_SIZE if cell_size is None else cell_size
+        tolerance = PlacesGeometry.LOD_TOLERANCE if tolerance is None else tolerance
+        if not self.coords:
+            self.lod = None
+            return
+
+        coords = np.asarray(self.coords, dtype=float)
+        min_lon, min_lat = coords.min(axis=0)
+        max_lon, max_lat = coords.max(axis=0)
+        n_cols = int((max_lon - min_lon) // cell_size) + 1
+        n_rows = int((max_lat - min_lat) // cell_size) + 1
+
+        # Close the ring so the last edge is simplified and banded like the others
+        ring = list(self.coords)
+        if tuple(ring[0]) != tuple(ring[-1]):
+            ring.append(ring[0])
+
+        # Classify the cell centers against the simplified polygon
+        simplified = PlacesGeometry.simplify_polygon(ring, tolerance)
+        center_lons = min_lon + (np.arange(n_cols) + 0.5) * cell_size
+        center_lats = min_lat + (np.arange(n_rows) + 0.5) * cell_size
+        grid_lons, grid_lats = np.meshgrid(center_lons, center_lats)
+        grid_lons = grid_lons.ravel()
+        grid_lats = grid_lats.ravel()
+        inside = PlacesGeometry._points_in_polygon(grid_lats, grid_lons, simplified)
+
+        # Cells whose center is close to the boundary may be crossed by it
+        centers = np.column_stack((grid_lons, grid_lats))
+        distance = np.full(len(centers), np.inf)
+        for a, b in zip(simplified[:-1], simplified[1:]):
+            seg = PlacesGeometry._segment_distances(centers, np.asarray(a), np.asarray(b))
+            np.minimum(distance, seg, out=distance)
+        band = cell_size * math.sqrt(2) / 2 + tolerance + 1e-9
+
+        mask = np.where(inside, PlacesGeometry.MASK_INSIDE, PlacesGeometry.MASK_OUTSIDE).astype(np.int8)
+        mask[distance <= band] = PlacesGeometry.MASK_BORDER
+
+        self.lod = {
+            'simplified': simplified,
+            'mask': mask.reshape(n_rows, n_cols),
+            'origin': (min_lon, min_lat),
+            'cell_size': cell_size
+        }
+
+    def contains(self, point):
+        """
+        Determine if the point (latitude, longitude) is inside the place. Uses the
+        level-of-detail mask and only falls back to ray-casting near the border.
+
+        :param point: A (latitude, longitude) pair.
+        :return: True if the point is inside the place, False otherwise.
+        """
+        return bool(self.contains_points(np.array([point[0]]), np.array([point[1]]))[0])
+
+    def contains_points(self, lats: np.ndarray, lons: np.ndarray):
+        """
+        Vectorized form of contains over arrays of latitudes and longitudes.
+
+        :param lats: An array of latitudes.
+        :param lons: An array of longitudes.
+        :return: A boolean array, True where the point is inside the place.
+        """
+        if self.lod is None:
+            self.build_lod()
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        result = np.zeros(len(lats), dtype=bool)
+        if self.lod is None:
+            return result
+
+        # Points outside the grid are outside the bounding box of the place
+        mask = self.lod['mask']
+        min_lon, min_lat = self.lod['origin']
+        cols = np.floor((lons - min_lon) / self.lod['cell_size'])
+        rows = np.floor((lats - min_lat) / self.lod['cell_size'])
+        in_grid = (cols >= 0) & (cols < mask.shape[1]) & (rows >= 0) & (rows < mask.shape[0])
+        idx = np.flatnonzero(in_grid)
+        cells = mask[rows[idx].astype(int), cols[idx].astype(int)]
+
+        result[idx] = cells == PlacesGeometry.MASK_INSIDE
+
+        # Only points in border cells need the exact test
+        border = idx[cells == PlacesGeometry.MASK_BORDER]
+        if len(border):
+            result[border] = PlacesGeometry._points_in_polygon(lats[border], lons[border], self.coords)
+        return result
+
     @staticmethod
     def find_county(point: LatLon, counties: list):
         """
@@ -83,10 +262,68 @@ class PlacesGeometry:
         :return: The county object that contains the point, or None if not found.
         """
         for county in counties:
-            if PlacesGeometry.is_point_in_polygon(point, county.coords):
+            if county.contains((point.get_lat(), point.get_lon())):
                 return county
         return None
 
+    @staticmethod
+    def assign_counties(coords: np.ndarray, counties: list):
+        """
+        Find the county containing each point, in bulk.
+
+        :param coords: An array of (latitude, longitude) rows.
+        :param counties: A list of county objects.
+        :return: An array with the index of the containing county per point, or -1 if not found.
+        """
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        result = np.full(len(coords), -1)
+        for i, county in enumerate(counties):
+            unassigned = np.flatnonzero(result == -1)
+            if not len(unassigned):
+                break
+            hits = county.contains_points(coords[unassigned, 0], coords[unassigned, 1])
+            result[unassigned[hits]] = i
+        return result
+
+    @staticmethod
+    def score_counties(counties: list):
+        """
+        Evaluate the diversity criteria and additional charger counts for all counties
+        at once, as columns aligned with the input list. Counties without population
+        data are never diversity counties and score no chargers.
+
+        :param counties: A list of county objects.
+        :return: A dictionary of 'population', 'income', 'diversity' and 'chargers' arrays.
+        :raises ValueError: If a county has population data but no median income.
+        """
+        for county in counties:
+            if county.pop is not None and county.inc is None:
+                raise ValueError(f"{county.name} has population data but no median income")
+
+        population = np.array([np.nan if c.pop is None else c.pop for c in counties], dtype=float)
+        median_income = np.array([np.nan if c.inc is None else c.inc for c in counties], dtype=float)
+
+        has_data = ~np.isnan(population)
+        diversity = has_data & (
+            ((population < PlacesGeometry.POPULATION_THRESHOLD) & (median_income < PlacesGeometry.INCOME_THRESHOLD))
+            | (median_income < PlacesGeometry.MIN_INCOME_THRESHOLD)
+        )
+
+        # Example formula: inverse relation to population and income
+        population_factor = PlacesGeometry.POPULATION_THRESHOLD / np.maximum(population[has_data], 1)
+        income_factor = PlacesGeometry.INCOME_THRESHOLD / np.maximum(median_income[has_data], 1)
+
+        # Scale the number of additional chargers
+        chargers = np.zeros(len(counties), dtype=int)
+        chargers[has_data] = np.minimum(2, np.trunc(population_factor + income_factor)).astype(int)
+
+        return {
+            'population': population,
+            'income': median_income,
+            'diversity': diversity,
+            'chargers': chargers
+        }
+
     @staticmethod
     def identify_diversity_counties(counties_info: list):
         """
@@ -96,16 +333,8 @@ class PlacesGeometry:
         :return: A list of county objects that meet the diversity criteria.
         """
         print("Identifying diversity counties...")
-        diversity_counties = []
-        for county in counties_info:
-            population = county.pop
-            median_income = county.inc
-            if (population is not None) and (
-                (population < PlacesGeometry.POPULATION_THRESHOLD and median_income < PlacesGeometry.INCOME_THRESHOLD)
-                or median_income < PlacesGeometry.MIN_INCOME_THRESHOLD
-            ):
-                diversity_counties.append(county)
-        return diversity_counties
+        diversity = PlacesGeometry.score_counties(counties_info)['diversity']
+        return [county for county, flag in zip(counties_info, diversity) if flag]
 
     @staticmethod
     def calculate_additional_chargers(counties: list):
@@ -115,22 +344,12 @@ class PlacesGeometry:
         :param counties: A list of county objects.
         :return: A list of county objects with updated charger numbers.
         """
-        update_list = []
         print("Calculating additional chargers...")
-        for county in counties:
-            population = county.pop
-            median_income = county.inc
-
-            # Example formula: inverse relation to population and income
-            population_factor = PlacesGeometry.POPULATION_THRESHOLD / max(population, 1)
-            income_factor = PlacesGeometry.INCOME_THRESHOLD / max(median_income, 1)
-
-            # Scale the number of additional chargers
-            additional_chargers = min(2, int(population_factor + income_factor))
+        chargers = PlacesGeometry.score_counties(counties)['chargers']
+        for county, additional_chargers in zip(counties, chargers.tolist()):
             county.charger_num = additional_chargers
-            update_list.append(county)
 
-        return update_list
+        return list(counties)
 
     @staticmethod
     def find_remaining_counties(pois: list, counties: list):
@@ -141,13 +360,22 @@ class PlacesGeometry:
         :param counties: A list of county objects.
         :return: A list of remaining county objects with assigned chargers.
         """
-        remaining = counties.copy()
-        for poi in pois:
-            lat = poi['latitude']
-            lon = poi['longitude']
-            county = PlacesGeometry.find_county(LatLon(lat, lon), counties)
-            if county in remaining:
-                remaining.remove(county)
+        coords = np.array([[poi['latitude'], poi['longitude']] for poi in pois])
+        return PlacesGeometry.find_remaining_counties_chunks([{'coords': coords}], counties)
+
+    @staticmethod
+    def find_remaining_counties_chunks(chunks, counties: list):
+        """
+        Incremental form of find_remaining_counties over chunks from CSVAnalysis.read_chunks.
+
+        :param chunks: An iterable of dictionaries with a 'coords' (latitude, longitude) array.
+        :param counties: A list of county objects.
+        :return: A list of remaining county objects with assigned chargers.
+        """
+        found = set()
+        for chunk in chunks:
+            found.update(PlacesGeometry.assign_counties(chunk['coords'], counties).tolist())
+        remaining = [county for i, county in enumerate(counties) if i not in found]
         for county in remaining:
             county.charger_num = 1
 
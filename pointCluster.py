@@ -1,7 +1,11 @@
+import os
+import math
 import numpy as np
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from placesGeometry import PlacesGeometry
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
 from geopy.distance import great_circle
 from collections import defaultdict
 from latLon import LatLon
@@ -66,6 +70,26 @@ class PointCluster:
         
         return filtered_points    
 
+    @staticmethod
+    def filter_close_chunks(chunks, threshold=0.02) -> list:
+        """
+        Incremental form of filter_close_points over chunks from CSVAnalysis.read_chunks.
+        Only one representative point and a count are kept per grid cell.
+        """
+        print("Filtering points...")
+        grid = {}
+        for chunk in chunks:
+            coords = chunk['coords']
+            keys = np.trunc(coords / threshold).astype(np.int64)
+            for (lat, lon), key in zip(coords.tolist(), map(tuple, keys.tolist())):
+                cell = grid.get(key)
+                if cell is None:
+                    grid[key] = {'latitude': lat, 'longitude': lon, 'weight': 1}
+                else:
+                    cell['weight'] += 1
+        
+        return list(grid.values())
+
     @staticmethod
     def assign_weights(lat_lons: list, pois: list) -> list:
         """
@@ -74,9 +98,10 @@ class PointCluster:
         """
         print("Assigning Weights...")
         poi_list = []
-        for val in lat_lons:
+        weights = LatLon.calculate_weights([val['weight'] for val in lat_lons])
+        for val, weight in zip(lat_lons, weights.tolist()):
             point = LatLon(val['latitude'], val['longitude'])
-            point.set_weight(LatLon.calculate_weight(val['weight']))
+            point.set_weight(weight)
             poi = Poi.find_poi(pois, val['latitude'], val['longitude'])
             if isinstance(poi, Poi):
                 poi = Poi(poi.name, poi.type, point)
@@ -213,20 +238,213 @@ class PointCluster:
         return nearest_point
 
 
-    def point_cluster(self):
+    @staticmethod
+    def _cluster_tile(tile: dict) -> dict:
+        """
+        Run DBSCAN on one tile (owned points followed by halo points) and report what
+        the merge step needs: local labels and exact core flags of the owned points,
+        edges from owned core points to halo points, and the neighbors of owned
+        non-core points.
+        """
+        ids = tile['ids']
+        coords = tile['coords']
+        n_owned = tile['n_owned']
+
+        # Search the neighborhoods once and let DBSCAN reuse them
+        nn = NearestNeighbors(radius=tile['eps'], metric=PointCluster.haversine_distance).fit(coords)
+        graph = nn.radius_neighbors_graph(coords, mode='distance')
+        db = DBSCAN(eps=tile['eps'], min_samples=tile['min_samples'], metric='precomputed').fit(graph)
+        core = np.zeros(len(coords), dtype=bool)
+        core[db.core_sample_indices_] = True
+        owned_core = core[:n_owned]
+
+        # Only owned points within the halo of the tile edge can reach halo points
+        min_lat, min_lon, max_lat, max_lon = tile['bounds']
+        halo_lat, halo_lon = tile['halo']
+        lat = coords[:n_owned, 0]
+        lon = coords[:n_owned, 1]
+        near_edge = ((lat - min_lat < halo_lat) | (max_lat - lat < halo_lat)
+                     | (lon - min_lon < halo_lon) | (max_lon - lon < halo_lon))
+
+        # Non-core points with no neighbors besides themselves stay noise
+        has_neighbors = np.diff(graph.indptr)[:n_owned] > 1
+        query = np.flatnonzero((~owned_core & has_neighbors) | (owned_core & near_edge & (len(coords) > n_owned)))
+
+        edges = []
+        borders = {}
+        for i in query:
+            neighbors = graph.indices[graph.indptr[i]:graph.indptr[i + 1]]
+            if owned_core[i]:
+                edges.extend((ids[i], ids[j]) for j in neighbors if j >= n_owned)
+            else:
+                borders[ids[i]] = [ids[j] for j in neighbors if j != i]
+
+        return {
+            'ids': ids[:n_owned],
+            'labels': db.labels_[:n_owned],
+            'core': owned_core,
+            'edges': edges,
+            'borders': borders
+        }
+
+    @staticmethod
+    def tiled_dbscan(coords: np.ndarray, eps: float, min_samples: int, tile_size: float = 1.0,
+                     halo: float = None, workers: int = None) -> np.ndarray:
+        """
+        Run DBSCAN over geographic tiles in parallel worker processes and merge clusters
+        that cross tile borders with a union-find pass. Each tile is clustered together
+        with a halo (meters, defaults to eps), so labels match a global DBSCAN up to
+        cluster numbering and the assignment of ambiguous border points. Tiles are
+        built and submitted a few at a time to bound the memory of the parent.
+        """
+        if halo is None:
+            halo = eps
+        if halo < eps:
+            raise ValueError(f"Halo of {halo} meters is smaller than eps of {eps} meters")
+
+        print("Partitioning points into tiles...")
+        coords = np.asarray(coords, dtype=float)
+        keys = np.floor(coords / tile_size).astype(np.int64)
+        halo_lat = math.degrees(halo / (6371.0088 * 1000))
+
+        # Bucket the points by tile once
+        tile_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(tile_keys)))))
+        buckets = {tuple(key): order[bounds[t]:bounds[t + 1]] for t, key in enumerate(tile_keys.tolist())}
+
+        def make_tiles():
+            """
+            Build each tile with its halo from the neighboring buckets.
+            """
+            for (row, col), owned in buckets.items():
+                min_lat, min_lon = row * tile_size, col * tile_size
+                max_lat, max_lon = min_lat + tile_size, min_lon + tile_size
+
+                # Widen the longitude halo for the highest latitude the tile reaches
+                max_abs_lat = min(max(abs(min_lat), abs(max_lat)) + halo_lat, 89.9)
+                ratio = min(math.sin(math.radians(halo_lat) / 2) / math.cos(math.radians(max_abs_lat)), 1.0)
+                halo_lon = math.degrees(2 * math.asin(ratio))
+
+                reach_rows = math.ceil(halo_lat / tile_size)
+                reach_cols = math.ceil(halo_lon / tile_size)
+                candidates = [
+                    buckets[(r, c)]
+                    for r in range(row - reach_rows, row + reach_rows + 1)
+                    for c in range(col - reach_cols, col + reach_cols + 1)
+                    if (r, c) != (row, col) and (r, c) in buckets
+                ]
+                halo_ids = np.concatenate(candidates) if candidates else np.empty(0, dtype=owned.dtype)
+                near = coords[halo_ids]
+                in_halo = ((near[:, 0] >= min_lat - halo_lat) & (near[:, 0] <= max_lat + halo_lat)
+                           & (near[:, 1] >= min_lon - halo_lon) & (near[:, 1] <= max_lon + halo_lon))
+                ids = np.concatenate((owned, halo_ids[in_halo]))
+                yield {
+                    'ids': ids,
+                    'coords': coords[ids],
+                    'n_owned': len(owned),
+                    'eps': eps,
+                    'min_samples': min_samples,
+                    'bounds': (min_lat, min_lon, max_lat, max_lon),
+                    'halo': (halo_lat, halo_lon)
+                }
+
+        parent = np.arange(len(coords))
+
+        def find(i):
+            """
+            Find the root of a point, halving the path along the way.
+            """
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            """
+            Join the sets of two points, keeping the smaller index as root.
+            """
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        core = np.zeros(len(coords), dtype=bool)
+        edges = []
+        borders = {}
+
+        def collect(result):
+            """
+            Merge the result of one tile as soon as it is available.
+            """
+            # Core points in the same local cluster belong to the same global cluster
+            core[result['ids']] = result['core']
+            core_ids = result['ids'][result['core']]
+            core_labels = result['labels'][result['core']]
+            for k in np.unique(core_labels):
+                members = core_ids[core_labels == k]
+                for i in members[1:]:
+                    union(members[0], i)
+            edges.extend(result['edges'])
+            borders.update(result['borders'])
+
+        print(f"Clustering {len(buckets)} tiles...")
+        if workers == 1:
+            for tile in make_tiles():
+                collect(PointCluster._cluster_tile(tile))
+        else:
+            max_pending = 2 * (workers or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = set()
+                for tile in make_tiles():
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                    pending.add(executor.submit(PointCluster._cluster_tile, tile))
+                for future in wait(pending).done:
+                    collect(future.result())
+
+        print("Merging tiles...")
+        # Core points linked across a tile border
+        for i, j in edges:
+            if core[j]:
+                union(i, j)
+
+        labels = np.full(len(coords), -1)
+        core_ids = np.flatnonzero(core)
+        roots = np.array([find(i) for i in core_ids], dtype=int)
+        _, cluster_ids = np.unique(roots, return_inverse=True)
+        labels[core_ids] = cluster_ids
+
+        # Border points join the cluster of a neighboring core point
+        for i, neighbors in borders.items():
+            for j in neighbors:
+                if core[j]:
+                    labels[i] = labels[j]
+                    break
+
+        return labels
+
+    def point_cluster(self, tile_size: float = None, workers: int = None):
         """
         Perform DBSCAN clustering on the points and calculate cluster centroids.
+        If a tile size (degrees) is given, clustering runs tiled across worker processes.
         """
         if not isinstance(self.coords, np.ndarray):
             self.coords = np.array([[poi['latitude'], poi['longitude']] for poi in self.points])
 
         kms_per_radian = 6371.0088
         epsilon = 20000 / kms_per_radian  # 20000 meters in radians
+        min_samples = 3
 
         print("Starting point clustering...")
 
-        db = DBSCAN(eps=epsilon, min_samples=3, metric=PointCluster.haversine_distance).fit(self.coords)
-        self.labels = db.labels_
+        if tile_size:
+            self.labels = PointCluster.tiled_dbscan(self.coords, epsilon, min_samples, tile_size, workers=workers)
+        else:
+            db = DBSCAN(eps=epsilon, min_samples=min_samples, metric=PointCluster.haversine_distance).fit(self.coords)
+            self.labels = db.labels_
 
         print("Calculating points per cluster...")
         self.unique_labels = set(self.labels)